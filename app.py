@@ -1,24 +1,57 @@
 # --- Main Imports ---
-from flask import Flask, request, jsonify, render_template, send_from_directory
-import cv2
+from flask import (Flask, Blueprint, Response, current_app, request, jsonify, render_template,
+                   send_file, send_from_directory, stream_with_context)
 import os
 import math
+import glob
+import importlib
+import tempfile
+import threading
 from werkzeug.utils import secure_filename
-import numpy as np
 from collections import defaultdict
 
-# --- NEW: Import PyMuPDF (fitz) instead of pdf2image ---
-# This version does NOT require Poppler.
+from result_cache import FileCache, ResultCache, file_content_hash
+
+# --- Lazy imaging backends ---
+# cv2, numpy and PyMuPDF take most of a worker's startup time, and endpoints
+# like / and /measure never touch them. They are imported on first use instead
+# of at module load; set PRELOAD_BACKENDS=1 to import them up front (e.g. in a
+# gunicorn master with preload_app, so forked workers share the loaded pages).
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access."""
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+# PyMuPDF (fitz) instead of pdf2image - does NOT require Poppler.
 # Ensure you have installed it: pip install PyMuPDF
-import fitz
+fitz = LazyModule('fitz')
+vector_geometry = LazyModule('vector_geometry')
+measurement_export = LazyModule('measurement_export')
 
-app = Flask(__name__)
-app.config['UPLOAD_FOLDER'] = 'uploads'
-app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
+def preload_backends():
+    """Imports every lazy backend now instead of on the first request that needs it."""
+    for module in (np, cv2, fitz, vector_geometry, measurement_export):
+        module.load()
 
-# Create upload directory if it doesn't exist
-if not os.path.exists(app.config['UPLOAD_FOLDER']):
-    os.makedirs(app.config['UPLOAD_FOLDER'])
+bp = Blueprint('measurement', __name__)
+
+def ensure_upload_folder():
+    """Create upload directory if it doesn't exist"""
+    os.makedirs(current_app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 class ImageMeasurer:
     def __init__(self):
@@ -40,9 +73,15 @@ class ImageMeasurer:
 # Global measurer instance
 measurer = ImageMeasurer()
 
+PDF_RENDER_DPI = 200
+
 # --- REVISED: PDF Conversion using PyMuPDF ---
 def convert_pdf_to_image(pdf_path, output_folder):
-    """Converts the first page of a PDF to a PNG image using PyMuPDF."""
+    """
+    Converts the first page of a PDF to a PNG image using PyMuPDF. If the page
+    carries vector drawings, they are also saved next to the PNG as a
+    SegmentStore so measurements can use the exact geometry.
+    """
     try:
         # Open the PDF file
         doc = fitz.open(pdf_path)
@@ -51,15 +90,27 @@ def convert_pdf_to_image(pdf_path, output_folder):
         page = doc.load_page(0)
         
         # Render the page to an image (pixmap) with a good resolution
-        pix = page.get_pixmap(dpi=200)
+        pix = page.get_pixmap(dpi=PDF_RENDER_DPI)
         
         # Define the output image path
         base_filename = os.path.splitext(os.path.basename(pdf_path))[0]
         image_filename = f"{base_filename}.png"
         image_path = os.path.join(output_folder, image_filename)
         
-        # Save the image and close the document
+        # Save the image
         pix.save(image_path)
+        
+        # Extract the vector line work once; scanned PDFs simply have none.
+        # A page PyMuPDF cannot walk still uploads, just without the sidecar.
+        try:
+            store = vector_geometry.SegmentStore.from_page(page, PDF_RENDER_DPI, pix.width, pix.height)
+            if len(store.segments) or len(store.fill_colors):
+                store.save(vector_store_path(image_path))
+            else:
+                remove_vector_store(image_path)
+        except Exception as e:
+            print(f"Vector extraction failed, using raster only: {e}")
+            remove_vector_store(image_path)
         doc.close()
         
         # Return the new filename and its full path
@@ -69,14 +120,58 @@ def convert_pdf_to_image(pdf_path, output_folder):
         print(f"PDF conversion error with PyMuPDF: {e}")
         return None, None
 
+# --- Vector geometry sidecars ---
+# A PDF rendered to "plan.png" keeps its drawings in "plan.vector.npz".
+
+def vector_store_path(image_path):
+    return os.path.splitext(image_path)[0] + '.vector.npz'
+
+def remove_vector_store(image_path):
+    """Drops a stale sidecar, e.g. when a raster upload replaces a PDF of the same name."""
+    path = vector_store_path(image_path)
+    if os.path.exists(path):
+        os.remove(path)
+
+def load_vector_store(image_path):
+    """Returns the SegmentStore for an uploaded image, or None for raster-only files."""
+    path = vector_store_path(image_path)
+    if not os.path.exists(path):
+        return None
+    
+    return current_app.extensions['vector_cache'].get(path, vector_geometry.SegmentStore.load)
+
+# --- Result cache ---
+def get_result_cache():
+    """The app's ResultCache, or None when RESULT_CACHE_ENABLED is off."""
+    return current_app.extensions.get('result_cache')
+
+def cached_result(filepath, endpoint, params, compute, is_valid=None):
+    """
+    Returns compute()'s (payload, status), memoized per image content and params.
+    Only successful (200) answers are stored; is_valid can reject a stale hit.
+    """
+    cache = get_result_cache()
+    if cache is None:
+        return compute()
+    
+    image_hash = file_content_hash(filepath)
+    payload = cache.get(image_hash, endpoint, params)
+    if payload is not None and (is_valid is None or is_valid(payload)):
+        return payload, 200
+    
+    payload, status = compute()
+    if status == 200:
+        cache.put(image_hash, endpoint, params, payload)
+    return payload, status
+
 # --- Flask Routes ---
 
-@app.route('/')
+@bp.route('/')
 def index():
     # Assumes you have an 'index.html' in a 'templates' folder
     return render_template('index.html')
 
-@app.route('/upload', methods=['POST'])
+@bp.route('/upload', methods=['POST'])
 def upload_file():
     try:
         if 'file' not in request.files:
@@ -87,13 +182,19 @@ def upload_file():
             return jsonify({'error': 'No file selected'}), 400
         
         if file:
+            ensure_upload_folder()
             filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+            filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+            
+            # Remember what the analysed image looked like before this upload replaces it
+            image_target = os.path.splitext(filepath)[0] + '.png' if filename.lower().endswith('.pdf') else filepath
+            old_hash = file_content_hash(image_target) if os.path.exists(image_target) else None
+            
             file.save(filepath)
             
             # Handle PDF file uploads using the new function
             if filename.lower().endswith('.pdf'):
-                image_filename, image_filepath = convert_pdf_to_image(filepath, app.config['UPLOAD_FOLDER'])
+                image_filename, image_filepath = convert_pdf_to_image(filepath, current_app.config['UPLOAD_FOLDER'])
                 
                 if image_filename and image_filepath:
                     # Update filename and filepath to point to the converted image
@@ -102,6 +203,15 @@ def upload_file():
                 else:
                     # If conversion fails, return a generic error
                     return jsonify({'error': 'Failed to convert the provided PDF file.'}), 500
+            else:
+                remove_vector_store(filepath)
+            
+            # The image changed under this name, so drop its cached results and previews
+            if old_hash and old_hash != file_content_hash(filepath):
+                cache = get_result_cache()
+                if cache is not None:
+                    cache.invalidate(old_hash)
+                remove_legend_previews(old_hash)
             
             # Process the image (original or converted) and get its dimensions
             img = cv2.imread(filepath)
@@ -111,7 +221,8 @@ def upload_file():
                     'success': True,
                     'filename': filename,
                     'width': width,
-                    'height': height
+                    'height': height,
+                    'vector': os.path.exists(vector_store_path(filepath))
                 })
             else:
                 return jsonify({'error': 'Invalid or unsupported image file'}), 400
@@ -119,7 +230,7 @@ def upload_file():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/calibrate', methods=['POST'])
+@bp.route('/calibrate', methods=['POST'])
 def calibrate():
     try:
         data = request.json
@@ -135,7 +246,7 @@ def calibrate():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/measure', methods=['POST'])
+@bp.route('/measure', methods=['POST'])
 def measure():
     try:
         data = request.json
@@ -153,16 +264,16 @@ def measure():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/uploads/<filename>')
+@bp.route('/uploads/<filename>')
 def uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
 
-@app.route('/detect-legends', methods=['POST'])
+@bp.route('/detect-legends', methods=['POST'])
 def detect_legends():
     try:
         data = request.json
         filename = data.get('filename')
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
         
         img = cv2.imread(filepath)
         if img is None:
@@ -224,7 +335,7 @@ def detect_legends():
                     # Extract small preview of the legend
                     legend_preview = img[y:y+h, x:x+w]
                     preview_filename = f"legend_preview_{legend_id}.png"
-                    preview_path = os.path.join(app.config['UPLOAD_FOLDER'], preview_filename)
+                    preview_path = os.path.join(current_app.config['UPLOAD_FOLDER'], preview_filename)
                     cv2.imwrite(preview_path, legend_preview)
                     
                     # Determine pattern type
@@ -288,8 +399,8 @@ def detect_pattern_type(img):
     vertical_count = 0
     
     if lines is not None and len(lines) > 2:  # Need at least 3 lines for hatching
-        for line in lines:
-            x1, y1, x2, y2 = line[0]
+        # OpenCV 4 returns (N, 1, 4), OpenCV 5 returns (N, 4)
+        for x1, y1, x2, y2 in lines.reshape(-1, 4):
             
             # Calculate angle
             dx = x2 - x1
@@ -328,19 +439,19 @@ def detect_pattern_type(img):
         return 'patterned'
 
 # --- FIX: Move this function to the far left (Global Scope) ---
-def get_adaptive_mask(full_img_hsv, sample_region_hsv):
+def get_adaptive_bounds(sample_region_hsv):
     """
-    Creates a mask based on the min/max HSV values of the clicked region
-    plus a tolerance, rather than using hardcoded color ranges.
+    Returns the (lower, upper) HSV bounds for the clicked region: the min/max
+    HSV values inside the sample plus a tolerance.
     """
     # 1. Calculate the range of colors existing inside the clicked area
-    h_min = np.min(sample_region_hsv[:,:,0])
-    s_min = np.min(sample_region_hsv[:,:,1])
-    v_min = np.min(sample_region_hsv[:,:,2])
+    h_min = int(np.min(sample_region_hsv[:,:,0]))
+    s_min = int(np.min(sample_region_hsv[:,:,1]))
+    v_min = int(np.min(sample_region_hsv[:,:,2]))
     
-    h_max = np.max(sample_region_hsv[:,:,0])
-    s_max = np.max(sample_region_hsv[:,:,1])
-    v_max = np.max(sample_region_hsv[:,:,2])
+    h_max = int(np.max(sample_region_hsv[:,:,0]))
+    s_max = int(np.max(sample_region_hsv[:,:,1]))
+    v_max = int(np.max(sample_region_hsv[:,:,2]))
     
     # 2. Add Tolerance (Relax the boundaries)
     tol_h = 10
@@ -359,18 +470,79 @@ def get_adaptive_mask(full_img_hsv, sample_region_hsv):
         lower_bound = np.array([max(0, h_min - tol_h), max(0, s_min - tol_s), max(0, v_min - tol_v)])
         upper_bound = np.array([min(180, h_max + tol_h), min(255, s_max + tol_s), min(255, v_max + tol_v)])
 
+    return lower_bound, upper_bound
+
+def get_adaptive_mask(full_img_hsv, sample_region_hsv):
+    """
+    Creates a mask based on the min/max HSV values of the clicked region
+    plus a tolerance, rather than using hardcoded color ranges.
+    """
+    lower_bound, upper_bound = get_adaptive_bounds(sample_region_hsv)
+
     # 3. Create the mask
     mask = cv2.inRange(full_img_hsv, lower_bound, upper_bound)
     return mask
 
-@app.route('/extract-legend-image', methods=['POST'])
+# --- Cached decoded sheets for click-to-region ---
+# Decoding a large PNG costs far more than the flood itself, so keep recent
+# sheets around (bounded by IMAGE_CACHE_BYTES). Only the flood window is ever
+# converted to HSV.
+def get_cached_image(filepath):
+    """Returns the BGR image for filepath, decoding it at most once per file version."""
+    return current_app.extensions['image_cache'].get(filepath, cv2.imread)
+
+def grow_region_from_seed(img, seed, lower_bound, upper_bound, max_area):
+    """
+    Grows the connected region around seed whose HSV values fall inside
+    [lower_bound, upper_bound], using cv2.floodFill on a window of the BGR
+    image around the seed, converted to HSV one window at a time.
+    
+    The window starts small and is doubled only while the region touches its
+    border, so the work done tracks the size of the region instead of the size
+    of the sheet (or of max_area). The area check stops runaway regions early.
+    
+    Returns (mask, (x0, y0)) where mask is a uint8 mask of the window and
+    (x0, y0) is the window origin, or (None, None) if the region exceeds max_area.
+    """
+    img_h, img_w = img.shape[:2]
+    seed_x, seed_y = seed
+    seed_val = cv2.cvtColor(img[seed_y:seed_y + 1, seed_x:seed_x + 1], cv2.COLOR_BGR2HSV)[0, 0].astype(int)
+    
+    # floodFill with FIXED_RANGE compares every pixel against the seed value,
+    # so express the absolute bounds as offsets from the seed.
+    lo_diff = tuple(float(max(0, v)) for v in seed_val - lower_bound)
+    up_diff = tuple(float(max(0, v)) for v in upper_bound - seed_val)
+    flags = 4 | cv2.FLOODFILL_FIXED_RANGE | cv2.FLOODFILL_MASK_ONLY | (255 << 8)
+    
+    radius = 32
+    while True:
+        x0, x1 = max(0, seed_x - radius), min(img_w, seed_x + radius + 1)
+        y0, y1 = max(0, seed_y - radius), min(img_h, seed_y + radius + 1)
+        window = cv2.cvtColor(img[y0:y1, x0:x1], cv2.COLOR_BGR2HSV)
+        
+        flood_mask = np.zeros((y1 - y0 + 2, x1 - x0 + 2), np.uint8)
+        area, _, _, rect = cv2.floodFill(window, flood_mask, (seed_x - x0, seed_y - y0),
+                                         (0, 0, 0), lo_diff, up_diff, flags)
+        if area > max_area:
+            return None, None
+        
+        rx, ry, rw, rh = rect
+        touches_border = ((rx == 0 and x0 > 0) or (ry == 0 and y0 > 0) or
+                          (rx + rw == x1 - x0 and x1 < img_w) or
+                          (ry + rh == y1 - y0 and y1 < img_h))
+        if not touches_border:
+            return flood_mask[1:-1, 1:-1], (x0, y0)
+        
+        radius *= 2
+
+@bp.route('/extract-legend-image', methods=['POST'])
 def extract_legend_image():
     try:
         data = request.json
         filename = data.get('filename')
         bounds = data.get('bounds')  # {x, y, width, height}
         
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
         img = cv2.imread(filepath)
         
         if img is None:
@@ -382,7 +554,7 @@ def extract_legend_image():
         
         # Save the extracted legend
         legend_filename = f"legend_{bounds['x']}_{bounds['y']}.png"
-        legend_path = os.path.join(app.config['UPLOAD_FOLDER'], legend_filename)
+        legend_path = os.path.join(current_app.config['UPLOAD_FOLDER'], legend_filename)
         cv2.imwrite(legend_path, legend_img)
         
         return jsonify({
@@ -393,151 +565,287 @@ def extract_legend_image():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/extract-unique-legends', methods=['POST'])
+def find_unique_legends(filepath, preview_prefix):
+    """Detects legend swatches and groups them by colour and pattern. Returns (payload, status)."""
+    img = cv2.imread(filepath)
+    if img is None:
+        return {'error': 'Could not read image file'}, 400
+    
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    
+    color_ranges = {
+        'red': ([0, 100, 100], [10, 255, 255]),
+        'red2': ([170, 100, 100], [180, 255, 255]),
+        'green': ([35, 50, 50], [85, 255, 255]),
+        'blue': ([95, 50, 50], [135, 255, 255]),
+        'orange': ([8, 100, 100], [25, 255, 255]),
+        'pink': ([145, 50, 50], [175, 255, 255]),
+        'cyan': ([80, 50, 50], [100, 255, 255]),
+        'yellow': ([20, 100, 100], [35, 255, 255]),
+        'purple': ([125, 50, 50], [145, 255, 255])
+    }
+    
+    all_legends = []
+    legend_id = 0
+    
+    for color_name, (lower, upper) in color_ranges.items():
+        lower = np.array(lower)
+        upper = np.array(upper)
+        mask = cv2.inRange(hsv, lower, upper)
+        
+        kernel = np.ones((3,3), np.uint8)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+        
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        
+        for contour in contours:
+            area = cv2.contourArea(contour)
+            if area > 50:
+                x, y, w, h = cv2.boundingRect(contour)
+                
+                if w < 10 or h < 10 or w > img.shape[1]*0.8 or h > img.shape[0]*0.8:
+                    continue
+                
+                leftmost = tuple(contour[contour[:,:,0].argmin()][0])
+                rightmost = tuple(contour[contour[:,:,0].argmax()][0])
+                topmost = tuple(contour[contour[:,:,1].argmin()][0])
+                bottommost = tuple(contour[contour[:,:,1].argmax()][0])
+                
+                width_pixels = rightmost[0] - leftmost[0]
+                height_pixels = bottommost[1] - topmost[1]
+                
+                legend_preview = img[y:y+h, x:x+w]
+                preview_filename = f"{preview_prefix}{legend_id}.png"
+                preview_path = os.path.join(current_app.config['UPLOAD_FOLDER'], preview_filename)
+                cv2.imwrite(preview_path, legend_preview)
+                
+                pattern_type = detect_pattern_type(legend_preview)
+                
+                all_legends.append({
+                    'id': legend_id,
+                    'color': color_name.replace('2', ''),
+                    'pattern': pattern_type,
+                    'preview_image': preview_filename,
+                    'bounds': {'x': int(x), 'y': int(y), 'width': int(w), 'height': int(h)},
+                    'points': {
+                        'left': [int(leftmost[0]), int(leftmost[1])],
+                        'right': [int(rightmost[0]), int(rightmost[1])],
+                        'top': [int(topmost[0]), int(topmost[1])],
+                        'bottom': [int(bottommost[0]), int(bottommost[1])]
+                    },
+                    'dimensions': {
+                        'width': int(width_pixels),
+                        'height': int(height_pixels)
+                    }
+                })
+                
+                legend_id += 1
+    
+    # Vector PDFs: swatches drawn as filled paths get their exact geometry.
+    # Hatched swatches are stroked, not filled, so they keep the raster values.
+    store = load_vector_store(filepath)
+    refined = refine_legends_with_vector_fills(all_legends, store) if store is not None else 0
+    
+    # Group similar legends
+    unique_groups = group_similar_legends(all_legends)
+    
+    return {
+        'success': True,
+        'unique_groups': unique_groups,
+        'total_legends': len(all_legends),
+        'source': 'vector' if refined else 'raster'
+    }, 200
+
+@bp.route('/extract-unique-legends', methods=['POST'])
 def extract_unique_legends():
     try:
         data = request.json
         filename = data.get('filename')
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        
-        img = cv2.imread(filepath)
-        if img is None:
+        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+        if not os.path.exists(filepath):
             return jsonify({'error': 'Could not read image file'}), 400
-            
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
         
-        color_ranges = {
-            'red': ([0, 100, 100], [10, 255, 255]),
-            'red2': ([170, 100, 100], [180, 255, 255]),
-            'green': ([35, 50, 50], [85, 255, 255]),
-            'blue': ([95, 50, 50], [135, 255, 255]),
-            'orange': ([8, 100, 100], [25, 255, 255]),
-            'pink': ([145, 50, 50], [175, 255, 255]),
-            'cyan': ([80, 50, 50], [100, 255, 255]),
-            'yellow': ([20, 100, 100], [35, 255, 255]),
-            'purple': ([125, 50, 50], [145, 255, 255])
-        }
+        # Previews are named after the image content, so cached results keep
+        # pointing at the right files whatever else gets analysed meanwhile
+        preview_prefix = legend_preview_prefix(file_content_hash(filepath))
+        params = {'vector': os.path.exists(vector_store_path(filepath))}
         
-        all_legends = []
-        legend_id = 0
+        def previews_exist(payload):
+            return all(os.path.exists(os.path.join(current_app.config['UPLOAD_FOLDER'], legend['preview_image']))
+                       for group in payload.get('unique_groups', []) for legend in group['instances'])
         
-        for color_name, (lower, upper) in color_ranges.items():
-            lower = np.array(lower)
-            upper = np.array(upper)
-            mask = cv2.inRange(hsv, lower, upper)
-            
-            kernel = np.ones((3,3), np.uint8)
-            mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
-            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
-            
-            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            for contour in contours:
-                area = cv2.contourArea(contour)
-                if area > 50:
-                    x, y, w, h = cv2.boundingRect(contour)
-                    
-                    if w < 10 or h < 10 or w > img.shape[1]*0.8 or h > img.shape[0]*0.8:
-                        continue
-                    
-                    leftmost = tuple(contour[contour[:,:,0].argmin()][0])
-                    rightmost = tuple(contour[contour[:,:,0].argmax()][0])
-                    topmost = tuple(contour[contour[:,:,1].argmin()][0])
-                    bottommost = tuple(contour[contour[:,:,1].argmax()][0])
-                    
-                    width_pixels = rightmost[0] - leftmost[0]
-                    height_pixels = bottommost[1] - topmost[1]
-                    
-                    legend_preview = img[y:y+h, x:x+w]
-                    preview_filename = f"legend_preview_{legend_id}.png"
-                    preview_path = os.path.join(app.config['UPLOAD_FOLDER'], preview_filename)
-                    cv2.imwrite(preview_path, legend_preview)
-                    
-                    pattern_type = detect_pattern_type(legend_preview)
-                    
-                    all_legends.append({
-                        'id': legend_id,
-                        'color': color_name.replace('2', ''),
-                        'pattern': pattern_type,
-                        'preview_image': preview_filename,
-                        'bounds': {'x': int(x), 'y': int(y), 'width': int(w), 'height': int(h)},
-                        'points': {
-                            'left': [int(leftmost[0]), int(leftmost[1])],
-                            'right': [int(rightmost[0]), int(rightmost[1])],
-                            'top': [int(topmost[0]), int(topmost[1])],
-                            'bottom': [int(bottommost[0]), int(bottommost[1])]
-                        },
-                        'dimensions': {
-                            'width': int(width_pixels),
-                            'height': int(height_pixels)
-                        }
-                    })
-                    
-                    legend_id += 1
-        
-        # Group similar legends
-        unique_groups = group_similar_legends(all_legends)
-        
-        return jsonify({
-            'success': True,
-            'unique_groups': unique_groups,
-            'total_legends': len(all_legends)
-        })
+        payload, status = cached_result(filepath, 'extract-unique-legends', params,
+                                        lambda: find_unique_legends(filepath, preview_prefix), previews_exist)
+        return jsonify(payload), status
         
     except Exception as e:
         print(f"Error: {str(e)}")
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
-@app.route('/measure-clicked-object', methods=['POST'])
-def measure_clicked_object():
+def legend_preview_prefix(image_hash):
+    return f"legend_preview_{image_hash[:12]}_"
+
+def remove_legend_previews(image_hash):
+    """Deletes the legend previews written for one image version."""
+    prefix = os.path.join(current_app.config['UPLOAD_FOLDER'], legend_preview_prefix(image_hash))
+    for path in glob.glob(glob.escape(prefix) + '*.png'):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def refine_legends_with_vector_fills(legends, store, min_overlap=0.8):
     """
-    Uses Hough Line Transform to find the nearest encompassing horizontal
-    and vertical lines around the click point, strictly defining the rectangular boundary.
+    Replaces the measured geometry of raster-detected legends with the exact
+    filled polygon that covers them, when the drawing has one. A fill only
+    counts if its bounding box and the legend's overlap by at least
+    min_overlap of both boxes, so large background fills never match.
+    Colour, pattern, bounds and preview are left as detected. Returns how
+    many legends were refined.
+    """
+    fills = [(pts, area) for _, pts, area in store.fill_regions() if area > 50]
+    if not fills or not legends:
+        return 0
+    boxes = np.array([np.concatenate((pts.min(axis=0), pts.max(axis=0))) for pts, _ in fills])
+    fill_areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    
+    refined = 0
+    for legend in legends:
+        b = legend['bounds']
+        x1, y1, x2, y2 = b['x'], b['y'], b['x'] + b['width'], b['y'] + b['height']
+        inter_w = np.clip(np.minimum(boxes[:, 2], x2) - np.maximum(boxes[:, 0], x1), 0, None)
+        inter_h = np.clip(np.minimum(boxes[:, 3], y2) - np.maximum(boxes[:, 1], y1), 0, None)
+        inter = inter_w * inter_h
+        overlap = np.minimum(inter / (b['width'] * b['height']), inter / np.maximum(fill_areas, 1e-9))
+        best = int(np.argmax(overlap))
+        if overlap[best] < min_overlap:
+            continue
+        
+        pts, area = fills[best]
+        leftmost = pts[pts[:, 0].argmin()]
+        rightmost = pts[pts[:, 0].argmax()]
+        topmost = pts[pts[:, 1].argmin()]
+        bottommost = pts[pts[:, 1].argmax()]
+        legend['points'] = {
+            'left': [int(leftmost[0]), int(leftmost[1])],
+            'right': [int(rightmost[0]), int(rightmost[1])],
+            'top': [int(topmost[0]), int(topmost[1])],
+            'bottom': [int(bottommost[0]), int(bottommost[1])]
+        }
+        legend['dimensions'] = {
+            'width': round(float(rightmost[0] - leftmost[0]), 2),
+            'height': round(float(bottommost[1] - topmost[1]), 2)
+        }
+        legend['area_pixels'] = round(area, 2)
+        refined += 1
+    
+    return refined
+
+@bp.route('/snap-point', methods=['POST'])
+def snap_point():
+    """
+    Snaps a cursor position to the nearest drawing line. Vector PDFs snap to
+    exact segment endpoints or the closest point on a segment; raster images
+    snap to the nearest Canny edge pixel around the cursor.
     """
     try:
         data = request.json
         filename = data.get('filename')
-        bounds = data.get('clicked_bounds') 
+        x, y = float(data.get('x', 0)), float(data.get('y', 0))
+        radius = float(data.get('radius', 10))
         
-        global_click_x = int(bounds['x'] + bounds['width'] / 2)
-        global_click_y = int(bounds['y'] + bounds['height'] / 2)
+        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+        store = load_vector_store(filepath)
+        if store is not None:
+            snapped = store.snap(x, y, radius)
+            if snapped is None:
+                return jsonify({'success': False, 'error': 'No line within snap radius.'})
+            sx, sy, kind = snapped
+            return jsonify({'success': True, 'point': {'x': round(sx, 2), 'y': round(sy, 2)},
+                            'kind': kind, 'source': 'vector'})
+        
+        img = cv2.imread(filepath, cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            return jsonify({'error': 'Could not read image'}), 400
+        
+        r = int(math.ceil(radius))
+        x1_crop, y1_crop = max(0, int(x) - r), max(0, int(y) - r)
+        x2_crop, y2_crop = min(img.shape[1], int(x) + r + 1), min(img.shape[0], int(y) + r + 1)
+        edges = cv2.Canny(img[y1_crop:y2_crop, x1_crop:x2_crop], 50, 150, apertureSize=3)
+        
+        edge_points = np.argwhere(edges > 0)
+        if len(edge_points) == 0:
+            return jsonify({'success': False, 'error': 'No line within snap radius.'})
+        dist = np.hypot(edge_points[:, 1] + x1_crop - x, edge_points[:, 0] + y1_crop - y)
+        best = int(np.argmin(dist))
+        if dist[best] > radius:
+            return jsonify({'success': False, 'error': 'No line within snap radius.'})
+        
+        return jsonify({
+            'success': True,
+            'point': {'x': int(edge_points[best][1] + x1_crop), 'y': int(edge_points[best][0] + y1_crop)},
+            'kind': 'edge',
+            'source': 'raster'
+        })
+    
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
 
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+def find_clicked_object(filepath, global_click_x, global_click_y, crop_radius):
+    """
+    Uses Hough Line Transform to find the nearest encompassing horizontal
+    and vertical lines around the click point, strictly defining the rectangular boundary.
+    For vector PDFs the lines come straight from the extracted drawing instead.
+    Returns (payload, status).
+    """
+    store = load_vector_store(filepath)
+    if store is not None:
+        img_h, img_w = store.height, store.width
+    else:
         img = cv2.imread(filepath)
-        if img is None: return jsonify({'error': 'Could not read image'}), 400
+        if img is None: return {'error': 'Could not read image'}, 400
+        img_h, img_w = img.shape[:2]
 
-        # --- STEP 1: TIGHT CROP ROI ---
-        # Keep crop tight to avoid seeing too many distant lines
-        crop_radius = 150 
-        y1_crop = max(0, global_click_y - crop_radius)
-        y2_crop = min(img.shape[0], global_click_y + crop_radius)
-        x1_crop = max(0, global_click_x - crop_radius)
-        x2_crop = min(img.shape[1], global_click_x + crop_radius)
-        
+    # --- STEP 1: TIGHT CROP ROI ---
+    y1_crop = max(0, global_click_y - crop_radius)
+    y2_crop = min(img_h, global_click_y + crop_radius)
+    x1_crop = max(0, global_click_x - crop_radius)
+    x2_crop = min(img_w, global_click_x + crop_radius)
+    
+    crop_h, crop_w = y2_crop - y1_crop, x2_crop - x1_crop
+    local_click_x = global_click_x - x1_crop
+    local_click_y = global_click_y - y1_crop
+
+    if store is not None:
+        # --- STEP 2 (VECTOR PDF): READ THE WALLS FROM THE DRAWING ITSELF ---
+        # Exact segment coordinates, no Canny/Hough and no dependence on render DPI
+        left, top, right, bottom = store.enclosing_box(global_click_x, global_click_y, crop_radius)
+        left_limit, right_limit = left - x1_crop, right - x1_crop
+        top_limit, bottom_limit = top - y1_crop, bottom - y1_crop
+    else:
         crop_img = img[y1_crop:y2_crop, x1_crop:x2_crop]
-        crop_h, crop_w = crop_img.shape[:2]
-        local_click_x = global_click_x - x1_crop
-        local_click_y = global_click_y - y1_crop
 
         # --- STEP 2: DETECT STRUCTURAL LINES ---
         gray = cv2.cvtColor(crop_img, cv2.COLOR_BGR2GRAY)
         # Use Canny to find strong edges (walls, boundaries)
         edges = cv2.Canny(gray, 50, 150, apertureSize=3)
-        
+    
         # Use Probabilistic Hough Transform to find line segments
         # minLineLength: ignore tiny noise lines
         # maxLineGap: bridge small gaps in imperfect CAD drawings
         lines = cv2.HoughLinesP(edges, 1, np.pi/180, threshold=30, minLineLength=20, maxLineGap=10)
-        
+    
         if lines is None:
-             return jsonify({'success': False, 'error': 'No structural lines found near click.'})
+             return {'success': False, 'error': 'No structural lines found near click.'}, 200
 
         horizontal_lines = []
         vertical_lines = []
 
-        for line in lines:
-            x1, y1, x2, y2 = line[0]
+        # OpenCV 4 returns (N, 1, 4), OpenCV 5 returns (N, 4)
+        for x1, y1, x2, y2 in lines.reshape(-1, 4):
             # Filter for purely horizontal or vertical lines (allowing slight slight tilt)
             if abs(y1 - y2) < 5: # Horizontal
                 y_pos = (y1 + y2) / 2
@@ -556,55 +864,160 @@ def measure_clicked_object():
         bottom_limit = crop_h
         left_limit = 0
         right_limit = crop_w
-        
+    
         # Find nearest horizontal line ABOVE click
         above = [y for y in horizontal_lines if y < local_click_y]
         if above: top_limit = max(above)
-            
+        
         # Find nearest horizontal line BELOW click
         below = [y for y in horizontal_lines if y > local_click_y]
         if below: bottom_limit = min(below)
-            
+        
         # Find nearest vertical line LEFT of click
         left = [x for x in vertical_lines if x < local_click_x]
         if left: left_limit = max(left)
-            
+        
         # Find nearest vertical line RIGHT of click
         right = [x for x in vertical_lines if x > local_click_x]
         if right: right_limit = min(right)
 
-        # Calculate final dimensions
-        final_w = right_limit - left_limit
-        final_h = bottom_limit - top_limit
-
-        # Safety check: If box is too tiny or still huge, reject it
-        if final_w < 5 or final_h < 5 or final_w > crop_w*0.9 or final_h > crop_h*0.9:
-             return jsonify({'success': False, 'error': 'Could not find clear enclosed boundaries.'})
-
-        # Determine precise length vs thickness based on orientation
-        if final_w > final_h * 1.2: # Clearly horizontal wall
-             precise_len = final_w
-             precise_thick = final_h
-             angle = 0
-        elif final_h > final_w * 1.2: # Clearly vertical wall
-             precise_len = final_h
-             precise_thick = final_w
-             angle = 90
-        else: # Square-ish
-             precise_len = max(final_w, final_h)
-             precise_thick = min(final_w, final_h)
-             angle = 0
+    # Calculate final dimensions
+    final_w = right_limit - left_limit
+    final_h = bottom_limit - top_limit
 
+    # Safety check: If box is too tiny or still huge, reject it
+    if final_w < 5 or final_h < 5 or final_w > crop_w*0.9 or final_h > crop_h*0.9:
+         return {'success': False, 'error': 'Could not find clear enclosed boundaries.'}, 200
+
+    # Determine precise length vs thickness based on orientation
+    if final_w > final_h * 1.2: # Clearly horizontal wall
+         precise_len = final_w
+         precise_thick = final_h
+         angle = 0
+    elif final_h > final_w * 1.2: # Clearly vertical wall
+         precise_len = final_h
+         precise_thick = final_w
+         angle = 90
+    else: # Square-ish
+         precise_len = max(final_w, final_h)
+         precise_thick = min(final_w, final_h)
+         angle = 0
+
+    return {
+        'success': True,
+        'object': {
+            'x': int(left_limit + x1_crop), 
+            'y': int(top_limit + y1_crop),
+            'width': int(final_w),
+            'height': int(final_h),
+            # Vector limits are float32; round so the noise doesn't reach the client
+            'precise_width': round(float(precise_thick), 2),  # Thickness
+            'precise_height': round(float(precise_len), 2),   # Length/Main dimension
+            'angle': angle
+        },
+        'source': 'vector' if store is not None else 'raster'
+    }, 200
+
+@bp.route('/measure-clicked-object', methods=['POST'])
+def measure_clicked_object():
+    try:
+        data = request.json
+        filename = data.get('filename')
+        bounds = data.get('clicked_bounds') 
+        
+        global_click_x = int(bounds['x'] + bounds['width'] / 2)
+        global_click_y = int(bounds['y'] + bounds['height'] / 2)
+        
+        # Snap the click to the centre of its cache cell, so every click in the
+        # cell is answered (and cached) identically
+        cell = current_app.config['RESULT_CACHE_CLICK_CELL']
+        if cell > 1:
+            global_click_x = (global_click_x // cell) * cell + cell // 2
+            global_click_y = (global_click_y // cell) * cell + cell // 2
+        
+        # Keep crop tight to avoid seeing too many distant lines
+        crop_radius = 150
+
+        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+        if not os.path.exists(filepath):
+            return jsonify({'error': 'Could not read image'}), 400
+        
+        params = {
+            'x': global_click_x,
+            'y': global_click_y,
+            'crop_radius': crop_radius,
+            'vector': os.path.exists(vector_store_path(filepath))
+        }
+        payload, status = cached_result(filepath, 'measure-clicked-object', params,
+                                        lambda: find_clicked_object(filepath, global_click_x, global_click_y, crop_radius))
+        return jsonify(payload), status
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+@bp.route('/measure-region', methods=['POST'])
+def measure_region():
+    """
+    Click-to-region: grows the connected blob under the click (matching the
+    clicked colour within the adaptive HSV tolerances) and returns its area,
+    perimeter and bounding dimensions in calibrated units.
+    """
+    try:
+        data = request.json
+        filename = data.get('filename')
+        bounds = data.get('clicked_bounds')
+        # Clients may lower the limit but never raise it past REGION_MAX_AREA
+        limit = current_app.config['REGION_MAX_AREA']
+        try:
+            max_area = int(data.get('max_area', limit))
+        except (TypeError, ValueError):
+            max_area = 0
+        if max_area <= 0:
+            return jsonify({'error': 'max_area must be a positive integer'}), 400
+        max_area = min(max_area, limit)
+        
+        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+        if not os.path.exists(filepath):
+            return jsonify({'error': 'Could not read image'}), 400
+        img = get_cached_image(filepath)
+        if img is None: return jsonify({'error': 'Could not read image'}), 400
+        img_h, img_w = img.shape[:2]
+        
+        # Sample the clicked box (at least one pixel) to derive the tolerances
+        sx1 = min(max(0, int(bounds['x'])), img_w - 1)
+        sy1 = min(max(0, int(bounds['y'])), img_h - 1)
+        sx2 = min(img_w, max(sx1 + 1, int(bounds['x'] + bounds['width'])))
+        sy2 = min(img_h, max(sy1 + 1, int(bounds['y'] + bounds['height'])))
+        lower_bound, upper_bound = get_adaptive_bounds(cv2.cvtColor(img[sy1:sy2, sx1:sx2], cv2.COLOR_BGR2HSV))
+        
+        seed = ((sx1 + sx2 - 1) // 2, (sy1 + sy2 - 1) // 2)
+        mask, origin = grow_region_from_seed(img, seed, lower_bound, upper_bound, max_area)
+        if mask is None:
+            return jsonify({'success': False, 'error': f'Region is larger than the maximum of {max_area} pixels.'})
+        
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        contour = max(contours, key=cv2.contourArea)
+        x, y, w, h = cv2.boundingRect(contour)
+        
+        area_pixels = int(cv2.countNonZero(mask))
+        perimeter_pixels = cv2.arcLength(contour, True)
+        
         return jsonify({
             'success': True,
-            'object': {
-                'x': int(left_limit + x1_crop), 
-                'y': int(top_limit + y1_crop),
-                'width': int(final_w),
-                'height': int(final_h),
-                'precise_width': precise_thick,  # Thickness
-                'precise_height': precise_len,   # Length/Main dimension
-                'angle': angle
+            'region': {
+                'x': int(x + origin[0]),
+                'y': int(y + origin[1]),
+                'width': int(w),
+                'height': int(h),
+                'area_pixels': area_pixels,
+                'perimeter_pixels': round(perimeter_pixels, 2),
+                'area': round(measurer.pixel_to_feet(measurer.pixel_to_feet(area_pixels)), 2),
+                'perimeter': round(measurer.pixel_to_feet(perimeter_pixels), 2),
+                'real_width': round(measurer.pixel_to_feet(w), 2),
+                'real_height': round(measurer.pixel_to_feet(h), 2),
+                'unit': 'feet',
+                'area_unit': 'sq ft'
             }
         })
 
@@ -711,12 +1124,81 @@ def get_color_ranges_for_detection(color_name):
     
     return all_ranges
 
-@app.route('/get-edge-points', methods=['POST'])
+@bp.route('/export-measurements', methods=['POST'])
+def export_measurements():
+    """
+    Exports a whole measurement session, recomputed in bulk against the stored
+    calibration. Accepts 'measurements' (line segments, either {x1, y1, x2, y2}
+    or the frontend's {line: {start, end}}), 'polygons' ({points}) and
+    'regions' (as returned by /measure-region). 'format' is csv, parquet, npz,
+    or columnar (parquet when pyarrow is installed, npz otherwise).
+    """
+    try:
+        data = request.json
+        segments = data.get('measurements', [])
+        polygons = data.get('polygons', [])
+        regions = data.get('regions', [])
+        export_format = data.get('format', 'csv')
+        base_name = os.path.splitext(secure_filename(data.get('filename') or '') or 'measurements')[0]
+        
+        if export_format == 'columnar':
+            export_format = 'parquet' if measurement_export.parquet_available() else 'npz'
+        if export_format not in ('csv', 'parquet', 'npz'):
+            return jsonify({'error': f'Unsupported export format: {export_format}'}), 400
+        if export_format == 'parquet' and not measurement_export.parquet_available():
+            return jsonify({'error': 'Parquet export requires pyarrow (pip install pyarrow)'}), 400
+        
+        measurement_export.validate(segments, polygons, regions)
+        chunks = measurement_export.iter_chunks(segments, polygons, regions, measurer.pixel_to_feet)
+        
+        if export_format == 'csv':
+            return Response(stream_with_context(measurement_export.csv_stream(chunks)),
+                            mimetype='text/csv',
+                            headers={'Content-Disposition': f'attachment; filename={base_name}.csv'})
+        
+        # Columnar formats are built in a spooled temp file: RAM for small sessions, disk for large ones
+        output = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        if export_format == 'parquet':
+            measurement_export.write_parquet(chunks, output)
+            mimetype = 'application/vnd.apache.parquet'
+        else:
+            measurement_export.write_npz(chunks, output, len(segments) + len(polygons) + len(regions),
+                                         measurement_export.text_widths(segments, polygons, regions))
+            mimetype = 'application/zip'
+        output.seek(0)
+        return send_file(output, mimetype=mimetype, as_attachment=True,
+                         download_name=f'{base_name}.{export_format}')
+    
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid measurement data: {e}'}), 400
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/metrics')
+def metrics():
+    cache = get_result_cache()
+    return jsonify({'result_cache': cache.stats() if cache is not None else None})
+
+@bp.route('/get-edge-points', methods=['POST'])
 def get_edge_points():
     try:
         data = request.json
         filename = data.get('filename')
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+        
+        # Vector PDFs: send the exact segments, the frontend snaps to their
+        # endpoints or the nearest point on them (same rules as /snap-point)
+        store = load_vector_store(filepath)
+        if store is not None:
+            segments = np.round(store.segments.astype(np.float64), 2).tolist()
+            return jsonify({
+                'success': True,
+                'edge_points': [],
+                'segments': segments,
+                'total_edges': len(segments),
+                'source': 'vector'
+            })
         
         img = cv2.imread(filepath)
         if img is None:
@@ -741,7 +1223,8 @@ def get_edge_points():
         return jsonify({
             'success': True,
             'edge_points': edge_coords,
-            'total_edges': len(edge_coords)
+            'total_edges': len(edge_coords),
+            'source': 'raster'
         })
         
     except Exception as e:
@@ -772,6 +1255,46 @@ def group_similar_legends(legends):
     return list(groups.values())
 
 
+# --- Application factory ---
+def create_app(config=None):
+    """Builds the Flask app. Heavy imaging backends stay unloaded unless PRELOAD_BACKENDS is set."""
+    app = Flask(__name__)
+    app.config['UPLOAD_FOLDER'] = 'uploads'
+    app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
+    app.config['REGION_MAX_AREA'] = 500000  # Max pixels a click-to-region flood may cover
+    app.config['IMAGE_CACHE_BYTES'] = 256 * 1024 * 1024  # Decoded sheets kept for click-to-region
+    app.config['VECTOR_CACHE_BYTES'] = 64 * 1024 * 1024  # Loaded vector sidecars
+    app.config['PRELOAD_BACKENDS'] = os.environ.get('PRELOAD_BACKENDS', '0') == '1'
+    app.config['RESULT_CACHE_ENABLED'] = True
+    app.config['RESULT_CACHE_DIR'] = None  # Defaults to <UPLOAD_FOLDER>/.result_cache
+    app.config['RESULT_CACHE_MEMORY_ENTRIES'] = 256
+    app.config['RESULT_CACHE_DISK_BYTES'] = 256 * 1024 * 1024
+    app.config['RESULT_CACHE_TTL'] = 7 * 24 * 3600  # Seconds
+    # Pixels; clicks snap to the centre of their cell (moving them by at most cell/2)
+    # so repeat clicks on the same wall share one result. 1 keeps exact pixels.
+    app.config['RESULT_CACHE_CLICK_CELL'] = 6
+    if config:
+        app.config.update(config)
+
+    # The most recent entry of each is kept even when it alone exceeds the budget
+    app.extensions['image_cache'] = FileCache(app.config['IMAGE_CACHE_BYTES'], lambda img: img.nbytes)
+    app.extensions['vector_cache'] = FileCache(app.config['VECTOR_CACHE_BYTES'], lambda store: store.nbytes)
+
+    if app.config['RESULT_CACHE_ENABLED']:
+        app.extensions['result_cache'] = ResultCache(
+            app.config['RESULT_CACHE_DIR'] or os.path.join(app.config['UPLOAD_FOLDER'], '.result_cache'),
+            max_entries=app.config['RESULT_CACHE_MEMORY_ENTRIES'],
+            max_disk_bytes=app.config['RESULT_CACHE_DISK_BYTES'],
+            ttl=app.config['RESULT_CACHE_TTL'])
+
+    app.register_blueprint(bp)
+
+    if app.config['PRELOAD_BACKENDS']:
+        preload_backends()
+    return app
+
+app = create_app()
+
 # --- Main entry point to run the app ---
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,61 @@
+"""
+Startup benchmark: time-to-first-request for a fresh worker process.
+
+Each run starts a new Python interpreter, imports app.py and issues one
+request through the test client, so the numbers include every import the
+worker has to pay for. Compares the lazy default with PRELOAD_BACKENDS=1,
+which loads cv2/numpy/PyMuPDF at import time the way app.py used to.
+
+    python bench_startup.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = r'''
+import json, sys, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+client = app.app.test_client()
+if sys.argv[1] == 'index':
+    response = client.get('/')
+else:
+    response = client.post('/measure', json={'x1': 0, 'y1': 0, 'x2': 30, 'y2': 40})
+t2 = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({'import': t1 - t0, 'first_request': t2 - t1, 'total': t2 - t0}))
+'''
+
+MODES = {
+    'lazy': {'PRELOAD_BACKENDS': '0'},
+    'preload': {'PRELOAD_BACKENDS': '1'},
+}
+
+
+def run_probe(endpoint, env_overrides):
+    env = dict(os.environ, **env_overrides)
+    out = subprocess.run([sys.executable, '-c', PROBE, endpoint], env=env,
+                         cwd=os.path.dirname(os.path.abspath(__file__)),
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'endpoint':<10}{'mode':<10}{'import ms':>12}{'request ms':>12}{'total ms':>12}")
+    for endpoint in ('index', 'measure'):
+        for mode, env in MODES.items():
+            samples = [run_probe(endpoint, env) for _ in range(args.runs)]
+            med = {k: statistics.median(s[k] for s in samples) * 1000 for k in samples[0]}
+            print(f"{endpoint:<10}{mode:<10}{med['import']:>12.1f}{med['first_request']:>12.1f}{med['total']:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
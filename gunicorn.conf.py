@@ -0,0 +1,12 @@
+# gunicorn -c gunicorn.conf.py app:app
+#
+# PRELOAD_BACKENDS=1 imports the app (and with it cv2/numpy/PyMuPDF) once in
+# the master before forking, so workers start warm and share those pages.
+# Leave it unset for the lazy default: workers boot fast and load the imaging
+# backends on the first request that needs them.
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+threads = int(os.environ.get('GUNICORN_THREADS', '1'))
+preload_app = os.environ.get('PRELOAD_BACKENDS', '0') == '1'
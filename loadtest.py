@@ -0,0 +1,317 @@
+"""
+Load test: simulates N estimators working on the same server at once.
+
+Every simulated session uploads one of the sample drawings in Uploads/,
+calibrates with its own scale, then issues a stream of /measure and
+/measure-clicked-object calls with periodic /extract-unique-legends runs.
+Each run starts a fresh server per worker configuration and reports
+throughput, latency percentiles and correctness mismatches:
+
+  measure        /measure answered with another session's calibration
+  clicked        /measure-clicked-object differs from a single-user reference run
+  legend         a legend preview image does not match the legend it belongs to
+  error          non-200 responses or transport failures
+
+Worker configurations:
+
+  threads:N      werkzeug dev server, one process, threaded (N client sessions share it)
+  processes:N    werkzeug dev server, forking up to N processes
+  gunicorn:WxT   gunicorn with W worker processes and T threads each
+
+    python loadtest.py --sessions 8 --iterations 20 threads:8 processes:4 gunicorn:2x4
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SAMPLES_DIR = os.path.join(ROOT, 'Uploads')
+CLICKS_PER_FILE = 12
+
+
+def create_server_app():
+    """App factory for the server under test; uploads go to LOADTEST_UPLOAD_FOLDER."""
+    from app import create_app
+    return create_app({'UPLOAD_FOLDER': os.environ['LOADTEST_UPLOAD_FOLDER']})
+
+
+# --- Server lifecycle ---
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(config, port, upload_folder):
+    kind, _, arg = config.partition(':')
+    env = dict(os.environ, LOADTEST_UPLOAD_FOLDER=upload_folder)
+    if kind == 'gunicorn':
+        workers, _, threads = arg.partition('x')
+        cmd = [sys.executable, '-m', 'gunicorn', '-w', workers, '--threads', threads or '1',
+               '-b', f'127.0.0.1:{port}', '--log-level', 'warning', 'loadtest:create_server_app()']
+    elif kind in ('threads', 'processes'):
+        cmd = [sys.executable, __file__, '--serve', kind, arg, str(port)]
+    else:
+        raise ValueError(f'Unknown worker configuration: {config}')
+
+    # stderr goes to a file rather than a pipe, so a chatty server can't block on it
+    errors = tempfile.TemporaryFile()
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=errors)
+    deadline = time.time() + 30
+    while time.time() < deadline and proc.poll() is None:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=1).read()
+            return proc
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    if proc.poll() is None:
+        proc.kill()
+        proc.wait()
+        reason = 'did not answer within 30s'
+    else:
+        reason = f'exited with status {proc.returncode}'
+    errors.seek(0)
+    output = errors.read().decode(errors='replace').strip()
+    errors.close()
+    raise RuntimeError(f'Server for {config} {reason}' + (f':\n{output[-2000:]}' if output else ''))
+
+
+def serve(kind, count, port):
+    """Entry point for --serve: runs the werkzeug server in this process."""
+    from werkzeug.serving import run_simple
+    app = create_server_app()
+    if kind == 'threads':
+        run_simple('127.0.0.1', port, app, threaded=True)
+    else:
+        run_simple('127.0.0.1', port, app, threaded=False, processes=count)
+
+
+# --- HTTP client ---
+
+class Client:
+    def __init__(self, base_url, stats):
+        self.base_url = base_url
+        self.stats = stats
+
+    def _send(self, endpoint, req):
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=300) as resp:
+                status, body = resp.status, resp.read()
+        except urllib.error.HTTPError as e:
+            status, body = e.code, e.read()
+        except (OSError, http.client.HTTPException) as e:
+            status, body = None, repr(e).encode()
+        self.stats.record_latency(endpoint, time.perf_counter() - start)
+        if status != 200:
+            self.stats.record_mismatch('error', f'{endpoint}: {status} {body[:200]!r}')
+            return None
+        return body
+
+    def post_json(self, endpoint, payload):
+        req = urllib.request.Request(self.base_url + endpoint, data=json.dumps(payload).encode(),
+                                     headers={'Content-Type': 'application/json'})
+        body = self._send(endpoint, req)
+        return json.loads(body) if body is not None else None
+
+    def upload(self, path):
+        boundary = uuid.uuid4().hex
+        with open(path, 'rb') as f:
+            content = f.read()
+        data = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; '
+                f'filename="{os.path.basename(path)}"\r\n'
+                f'Content-Type: application/octet-stream\r\n\r\n').encode() + content + \
+            f'\r\n--{boundary}--\r\n'.encode()
+        req = urllib.request.Request(self.base_url + '/upload', data=data,
+                                     headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+        body = self._send('/upload', req)
+        return json.loads(body) if body is not None else None
+
+    def get(self, endpoint, label=None):
+        return self._send(label or endpoint, urllib.request.Request(self.base_url + endpoint))
+
+
+# --- Results ---
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.mismatches = defaultdict(int)
+        self.examples = defaultdict(list)
+
+    def record_latency(self, endpoint, seconds):
+        with self.lock:
+            self.latencies[endpoint].append(seconds)
+
+    def record_mismatch(self, kind, detail):
+        with self.lock:
+            self.mismatches[kind] += 1
+            if len(self.examples[kind]) < 3:
+                self.examples[kind].append(detail)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def png_size(data):
+    """(width, height) from a PNG's IHDR chunk, or None for a truncated file."""
+    if len(data) < 24:
+        return None
+    return struct.unpack('>II', data[16:24])
+
+
+# --- Workload ---
+
+def pick_clicks(width, height, seed):
+    rng = random.Random(seed)
+    return [(rng.randrange(width), rng.randrange(height)) for _ in range(CLICKS_PER_FILE)]
+
+
+def clicked_payload(filename, x, y):
+    return {'filename': filename, 'clicked_bounds': {'x': x, 'y': y, 'width': 1, 'height': 1}}
+
+
+def build_reference(samples):
+    """Single-user answers for every sample click, computed in-process with the test client."""
+    from app import create_app
+    folder = tempfile.mkdtemp(prefix='loadtest-ref-')
+    try:
+        client = create_app({'UPLOAD_FOLDER': folder}).test_client()
+        reference = {}
+        for path in samples:
+            with open(path, 'rb') as f:
+                info = client.post('/upload', data={'file': (f, os.path.basename(path))}).get_json()
+            clicks = pick_clicks(info['width'], info['height'], os.path.basename(path))
+            for x, y in clicks:
+                result = client.post('/measure-clicked-object',
+                                     json=clicked_payload(info['filename'], x, y)).get_json()
+                reference[(os.path.basename(path), x, y)] = result
+        return reference
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def run_session(session_id, client, samples, reference, iterations, legend_every, stats):
+    rng = random.Random(session_id)
+    path = samples[session_id % len(samples)]
+    info = client.upload(path)
+    if not info:
+        return
+    filename = info['filename']
+    clicks = pick_clicks(info['width'], info['height'], os.path.basename(path))
+
+    # Each session calibrates to its own scale so cross-talk is detectable
+    pixel_distance, real_distance = 100.0 + session_id * 7, 10.0
+    client.post_json('/calibrate', {'pixel_distance': pixel_distance, 'real_distance': real_distance})
+
+    for i in range(iterations):
+        for _ in range(3):
+            x1, y1, x2, y2 = (rng.randrange(2000) for _ in range(4))
+            result = client.post_json('/measure', {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2})
+            if result is not None:
+                expected = round(((x1 - x2) ** 2 + (y1 - y2) ** 2) ** 0.5 * real_distance / pixel_distance, 2)
+                if abs(result['real_distance'] - expected) > 0.011:
+                    stats.record_mismatch('measure', f'session {session_id}: got {result["real_distance"]}, expected {expected}')
+
+        x, y = clicks[i % len(clicks)]
+        result = client.post_json('/measure-clicked-object', clicked_payload(filename, x, y))
+        expected = reference.get((os.path.basename(path), x, y))
+        if result is not None and result != expected:
+            stats.record_mismatch('clicked', f'{filename} @ ({x}, {y}): got {result}, expected {expected}')
+
+        if legend_every and i % legend_every == legend_every - 1:
+            result = client.post_json('/extract-unique-legends', {'filename': filename})
+            for group in (result or {}).get('unique_groups', []):
+                for legend in group['instances']:
+                    data = client.get(f"/uploads/{legend['preview_image']}", '/uploads/<preview>')
+                    bounds = legend['bounds']
+                    if data is not None and png_size(data) != (bounds['width'], bounds['height']):
+                        stats.record_mismatch('legend', f"{filename}: {legend['preview_image']} is "
+                                                        f"{png_size(data)}, legend is {bounds['width']}x{bounds['height']}")
+
+
+def run_config(config, samples, reference, args):
+    port = free_port()
+    upload_folder = tempfile.mkdtemp(prefix='loadtest-')
+    proc = start_server(config, port, upload_folder)
+    stats = Stats()
+    try:
+        base_url = f'http://127.0.0.1:{port}'
+        threads = [threading.Thread(target=run_session,
+                                    args=(i, Client(base_url, stats), samples, reference,
+                                          args.iterations, args.legend_every, stats))
+                   for i in range(args.sessions)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        proc.terminate()
+        proc.wait()
+        shutil.rmtree(upload_folder, ignore_errors=True)
+    return stats, elapsed
+
+
+def report(config, stats, elapsed):
+    total = sum(len(v) for v in stats.latencies.values())
+    print(f'\n=== {config}: {total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s)')
+    print(f"  {'endpoint':<26}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for endpoint in sorted(stats.latencies):
+        lat = stats.latencies[endpoint]
+        print(f'  {endpoint:<26}{len(lat):>7}' +
+              ''.join(f'{percentile(lat, p) * 1000:>10.1f}' for p in (50, 95, 99, 100)))
+    kinds = ('measure', 'clicked', 'legend', 'error')
+    print('  mismatches: ' + ', '.join(f'{k}={stats.mismatches.get(k, 0)}' for k in kinds))
+    for kind in kinds:
+        for example in stats.examples.get(kind, []):
+            print(f'    [{kind}] {example}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Multi-session load test for the measurement server.')
+    parser.add_argument('configs', nargs='*', default=['threads:8', 'processes:4'],
+                        help='worker configurations, e.g. threads:8 processes:4 gunicorn:2x4')
+    parser.add_argument('--sessions', type=int, default=8, help='concurrent simulated users')
+    parser.add_argument('--iterations', type=int, default=10, help='measurement rounds per session')
+    parser.add_argument('--legend-every', type=int, default=5,
+                        help='run legend extraction every N rounds (0 disables)')
+    parser.add_argument('--samples', nargs='*', help='files to upload (default: everything in Uploads/)')
+    parser.add_argument('--serve', nargs=3, metavar=('KIND', 'COUNT', 'PORT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        kind, count, port = args.serve
+        serve(kind, int(count), int(port))
+        return
+
+    samples = args.samples or sorted(os.path.join(SAMPLES_DIR, f) for f in os.listdir(SAMPLES_DIR))
+    print(f'Building single-user reference for {len(samples)} files...')
+    reference = build_reference(samples)
+
+    for config in args.configs:
+        stats, elapsed = run_config(config, samples, reference, args)
+        report(config, stats, elapsed)
+
+
+if __name__ == '__main__':
+    main()
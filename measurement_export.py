@@ -0,0 +1,220 @@
+# --- Measurement session export ---
+# Recomputes a whole session of measurements (line segments, polygons and
+# auto-detected regions) against the current calibration in vectorised
+# chunks, and writes them as CSV, Parquet (when pyarrow is installed) or a
+# NumPy .npz archive. Every writer consumes the rows chunk by chunk, so
+# memory stays bounded by CHUNK_SIZE rows rather than by the session size.
+
+import csv
+import io
+import shutil
+import tempfile
+import zipfile
+
+import numpy as np
+
+CHUNK_SIZE = 8192
+
+# (column, dtype) in output order; 'U' columns get their width from the data
+COLUMNS = [
+    ('kind', 'U'),
+    ('id', np.int64),
+    ('name', 'U'),
+    ('group', 'U'),
+    ('x', np.float64),           # Bounding box in image pixels
+    ('y', np.float64),
+    ('width', np.float64),
+    ('height', np.float64),
+    ('length_px', np.float64),   # Segment length or polygon/region perimeter
+    ('length', np.float64),      # ... in calibrated units (feet)
+    ('area_px', np.float64),     # 0 for segments
+    ('area', np.float64),        # ... in square feet
+]
+
+
+def _point(p):
+    return (p['x'], p['y']) if isinstance(p, dict) else (p[0], p[1])
+
+
+def _segment_coords(item):
+    """Accepts either {x1, y1, x2, y2} or the frontend's {line: {start, end}}."""
+    if 'line' in item:
+        return _point(item['line']['start']) + _point(item['line']['end'])
+    return item['x1'], item['y1'], item['x2'], item['y2']
+
+
+def _labels(items):
+    ids = np.array([int(item.get('id', -1)) for item in items], np.int64)
+    names = [str(item.get('name', '')) for item in items]
+    groups = [str(item.get('group', '') or '') for item in items]
+    return ids, names, groups
+
+
+def _converted(to_feet, values):
+    """to_feet(values) as a float array; an uncalibrated converter returns a scalar 0."""
+    return np.broadcast_to(np.asarray(to_feet(values), np.float64), values.shape)
+
+
+def _segment_chunk(items, to_feet):
+    coords = np.array([_segment_coords(item) for item in items], np.float64).reshape(-1, 4)
+    x1, y1, x2, y2 = coords.T
+    length_px = np.hypot(x2 - x1, y2 - y1)
+    ids, names, groups = _labels(items)
+    zeros = np.zeros(len(items))
+    return {
+        'kind': ['segment'] * len(items), 'id': ids, 'name': names, 'group': groups,
+        'x': np.minimum(x1, x2), 'y': np.minimum(y1, y2),
+        'width': np.abs(x2 - x1), 'height': np.abs(y2 - y1),
+        'length_px': length_px, 'length': _converted(to_feet, length_px),
+        'area_px': zeros, 'area': zeros,
+    }
+
+
+def _polygon_chunk(items, to_feet):
+    polys = [np.array([_point(p) for p in item['points']], np.float64).reshape(-1, 2) for item in items]
+    counts = np.array([len(poly) for poly in polys])
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    pts = np.concatenate(polys)
+
+    # Next vertex of every vertex, wrapping around within its own polygon
+    nxt = np.arange(len(pts)) + 1
+    nxt[starts + counts - 1] = starts
+    x, y = pts[:, 0], pts[:, 1]
+    cross = x * y[nxt] - x[nxt] * y
+    edge = np.hypot(x[nxt] - x, y[nxt] - y)
+
+    area_px = np.abs(np.add.reduceat(cross, starts)) / 2
+    perimeter_px = np.add.reduceat(edge, starts)
+    x_min, x_max = np.minimum.reduceat(x, starts), np.maximum.reduceat(x, starts)
+    y_min, y_max = np.minimum.reduceat(y, starts), np.maximum.reduceat(y, starts)
+    ids, names, groups = _labels(items)
+    return {
+        'kind': ['polygon'] * len(items), 'id': ids, 'name': names, 'group': groups,
+        'x': x_min, 'y': y_min, 'width': x_max - x_min, 'height': y_max - y_min,
+        'length_px': perimeter_px, 'length': _converted(to_feet, perimeter_px),
+        'area_px': area_px, 'area': _converted(to_feet, _converted(to_feet, area_px)),
+    }
+
+
+def _region_chunk(items, to_feet):
+    """Regions as returned by /measure-region (pixel values are recomputed into units)."""
+    box = np.array([(r['x'], r['y'], r['width'], r['height'], r['area_pixels'], r['perimeter_pixels'])
+                    for r in items], np.float64).reshape(-1, 6)
+    ids, names, groups = _labels(items)
+    return {
+        'kind': ['region'] * len(items), 'id': ids, 'name': names, 'group': groups,
+        'x': box[:, 0], 'y': box[:, 1], 'width': box[:, 2], 'height': box[:, 3],
+        'length_px': box[:, 5], 'length': _converted(to_feet, box[:, 5]),
+        'area_px': box[:, 4], 'area': _converted(to_feet, _converted(to_feet, box[:, 4])),
+    }
+
+
+def validate(segments, polygons, regions):
+    """
+    Checks the shape of every item up front, so a streamed CSV never fails
+    half-way through. Raises ValueError naming the first bad item.
+    """
+    checks = (
+        ('measurements', segments, lambda item: _segment_coords(item)),
+        ('polygons', polygons, lambda item: [v for p in item['points'] for v in _point(p)]
+            if len(item['points']) >= 3 else None),
+        ('regions', regions, lambda item: [item[k] for k in ('x', 'y', 'width', 'height',
+                                                            'area_pixels', 'perimeter_pixels')]),
+    )
+    for label, items, check in checks:
+        for index, item in enumerate(items):
+            try:
+                values = check(item)
+                ok = values is not None
+                if ok:
+                    [float(v) for v in values]
+                    int(item.get('id', -1))
+            except (KeyError, IndexError, TypeError, ValueError):
+                ok = False
+            if not ok:
+                raise ValueError(f'{label}[{index}] is malformed')
+
+
+def iter_chunks(segments, polygons, regions, to_feet, chunk_size=CHUNK_SIZE):
+    """Yields dicts of column -> values, at most chunk_size rows each."""
+    for items, build in ((segments, _segment_chunk), (polygons, _polygon_chunk), (regions, _region_chunk)):
+        for start in range(0, len(items), chunk_size):
+            yield build(items[start:start + chunk_size], to_feet)
+
+
+# --- Writers ---
+
+def csv_stream(chunks):
+    """Yields the CSV text chunk by chunk, for a streamed response."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(name for name, _ in COLUMNS)
+    for chunk in chunks:
+        columns = [chunk[name] if isinstance(chunk[name], list) else chunk[name].tolist()
+                   for name, _ in COLUMNS]
+        writer.writerows(zip(*columns))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def write_parquet(chunks, fileobj):
+    """Writes one Parquet row group per chunk. Requires pyarrow."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(name, pa.string() if dtype == 'U' else pa.from_numpy_dtype(dtype))
+                        for name, dtype in COLUMNS])
+    with pq.ParquetWriter(fileobj, schema, compression='zstd') as writer:
+        for chunk in chunks:
+            writer.write_table(pa.table({name: chunk[name] for name, _ in COLUMNS}, schema=schema))
+
+
+def write_npz(chunks, fileobj, total_rows, text_widths):
+    """
+    Writes a NumPy .npz with one array per column. Each column is streamed into
+    its own temporary .npy file (the header is written up front from total_rows),
+    then the files are packed into the archive one after another.
+    """
+    dtypes = {name: np.dtype(f'U{max(1, text_widths[name])}') if dtype == 'U' else np.dtype(dtype)
+              for name, dtype in COLUMNS}
+    parts = {}
+    try:
+        for name, _ in COLUMNS:
+            parts[name] = tempfile.TemporaryFile()
+            np.lib.format.write_array_header_1_0(parts[name], {
+                'descr': np.lib.format.dtype_to_descr(dtypes[name]),
+                'fortran_order': False,
+                'shape': (total_rows,),
+            })
+        for chunk in chunks:
+            for name, _ in COLUMNS:
+                parts[name].write(np.asarray(chunk[name], dtypes[name]).tobytes())
+
+        with zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+            for name, _ in COLUMNS:
+                parts[name].seek(0)
+                with archive.open(f'{name}.npy', 'w', force_zip64=True) as entry:
+                    shutil.copyfileobj(parts[name], entry)
+    finally:
+        for part in parts.values():
+            part.close()
+
+
+def text_widths(segments, polygons, regions):
+    """Longest value of every text column, which .npz needs to size its fixed-width strings."""
+    items = [item for group in (segments, polygons, regions) for item in group]
+    return {
+        'kind': len('polygon'),
+        'name': max((len(str(item.get('name', ''))) for item in items), default=1),
+        'group': max((len(str(item.get('group', '') or '')) for item in items), default=1),
+    }
@@ -0,0 +1,255 @@
+# --- Result cache for expensive analysis endpoints ---
+# Users keep clicking the same wall and re-opening the same sheet, and
+# /measure-clicked-object and /extract-unique-legends are pure functions of
+# the image and their parameters. Results are memoized under
+# (image content hash, endpoint, normalized parameters) in two tiers:
+#
+#   memory  LRU of the most recent results, per process
+#   disk    one JSON file per result under <directory>/<image hash>/, shared
+#           by every worker pointed at the same directory
+#
+# Both tiers expire entries after a TTL; the disk tier is also capped in
+# bytes and evicts the least recently written files first.
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+_hash_cache = {}
+_hash_lock = threading.Lock()
+
+
+def file_content_hash(filepath):
+    """SHA-256 of a file's bytes, recomputed only when its mtime or size changes."""
+    stat = os.stat(filepath)
+    key = os.path.abspath(filepath)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _hash_lock:
+        cached = _hash_cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    content_hash = digest.hexdigest()
+    with _hash_lock:
+        _hash_cache[key] = (version, content_hash)
+    return content_hash
+
+
+class FileCache:
+    """
+    In-process LRU of objects derived from files (decoded sheets, vector
+    stores), keyed by path + mtime + size and bounded by the bytes they hold.
+    The most recent entry is always kept, even when it alone exceeds the
+    budget, so repeated requests on one very large sheet still hit.
+    """
+
+    def __init__(self, max_bytes, sizeof):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof           # value -> bytes it holds
+        self._entries = OrderedDict()  # key -> value
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, filepath, load):
+        """Returns load(filepath), calling it at most once per file version. None is not cached."""
+        stat = os.stat(filepath)
+        key = (os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                return value
+
+        value = load(filepath)
+        if value is None:
+            return None
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = value
+                self._bytes += self.sizeof(value)
+            self._entries.move_to_end(key)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= self.sizeof(evicted)
+        return value
+
+
+class ResultCache:
+    def __init__(self, directory, max_entries=256, max_disk_bytes=256 * 1024 * 1024, ttl=7 * 24 * 3600):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self._memory = OrderedDict()   # key -> (expires_at, image_hash, value)
+        self._lock = threading.Lock()
+        self._disk_bytes = None        # Computed lazily on the first disk write
+        self._counts = defaultdict(lambda: {'memory_hits': 0, 'disk_hits': 0, 'misses': 0})
+
+    @staticmethod
+    def make_key(image_hash, endpoint, params):
+        raw = json.dumps([image_hash, endpoint, params], sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _entry_path(self, image_hash, key):
+        return os.path.join(self.directory, image_hash, key + '.json')
+
+    # --- Lookups ---
+
+    def get(self, image_hash, endpoint, params):
+        """Returns the cached value, or None on a miss."""
+        key = self.make_key(image_hash, endpoint, params)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self._counts[endpoint]['memory_hits'] += 1
+                    return entry[2]
+                del self._memory[key]
+
+        path = self._entry_path(image_hash, key)
+        try:
+            if os.path.getmtime(path) + self.ttl > now:
+                with open(path, 'r') as f:
+                    value = json.load(f)
+                self._remember(key, image_hash, value, os.path.getmtime(path) + self.ttl)
+                with self._lock:
+                    self._counts[endpoint]['disk_hits'] += 1
+                return value
+            self._remove_file(path)
+        except (OSError, ValueError):
+            pass
+
+        with self._lock:
+            self._counts[endpoint]['misses'] += 1
+        return None
+
+    def put(self, image_hash, endpoint, params, value):
+        key = self.make_key(image_hash, endpoint, params)
+        self._remember(key, image_hash, value, time.time() + self.ttl)
+
+        data = json.dumps(value, separators=(',', ':')).encode()
+        if len(data) > self.max_disk_bytes:
+            return
+        path = self._entry_path(image_hash, key)
+
+        # Write to a temp file and rename, so other workers never read half a result.
+        # A failed disk write only costs the disk tier, never the request.
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk_bytes()
+            else:
+                self._disk_bytes += len(data) - old_size
+            over_limit = self._disk_bytes > self.max_disk_bytes
+        if over_limit:
+            self._evict_disk()
+
+    def _remember(self, key, image_hash, value, expires_at):
+        with self._lock:
+            self._memory[key] = (expires_at, image_hash, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    # --- Invalidation ---
+
+    def invalidate(self, image_hash):
+        """Drops every cached result for one image, in memory and on disk."""
+        with self._lock:
+            for key in [k for k, entry in self._memory.items() if entry[1] == image_hash]:
+                del self._memory[key]
+            self._disk_bytes = None
+        shutil.rmtree(os.path.join(self.directory, image_hash), ignore_errors=True)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._disk_bytes = None
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    # --- Disk housekeeping ---
+
+    def _disk_files(self):
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.json'):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _scan_disk_bytes(self):
+        return sum(size for _, size, _ in self._disk_files())
+
+    def _remove_file(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict_disk(self):
+        """Removes expired files, then the oldest ones until the disk tier fits its budget."""
+        files = sorted(self._disk_files())
+        now = time.time()
+        total = sum(size for _, size, _ in files)
+        for mtime, size, path in files:
+            if mtime + self.ttl > now and total <= self.max_disk_bytes:
+                break
+            self._remove_file(path)
+            total -= size
+        with self._lock:
+            self._disk_bytes = total
+
+    # --- Metrics ---
+
+    def stats(self):
+        # Scan once if nothing has been written by this process yet
+        if self._disk_bytes is None:
+            disk_bytes = self._scan_disk_bytes()
+            with self._lock:
+                if self._disk_bytes is None:
+                    self._disk_bytes = disk_bytes
+        with self._lock:
+            endpoints = {}
+            totals = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+            for endpoint, counts in self._counts.items():
+                endpoints[endpoint] = dict(counts, hit_ratio=_hit_ratio(counts))
+                for name in totals:
+                    totals[name] += counts[name]
+            return {
+                'memory_entries': len(self._memory),
+                'disk_bytes': self._disk_bytes,
+                'totals': dict(totals, hit_ratio=_hit_ratio(totals)),
+                'endpoints': endpoints
+            }
+
+
+def _hit_ratio(counts):
+    lookups = counts['memory_hits'] + counts['disk_hits'] + counts['misses']
+    return round((counts['memory_hits'] + counts['disk_hits']) / lookups, 4) if lookups else 0.0
@@ -25,9 +25,12 @@ class ProfessionalImageMeasurementTool {
         this.legendGroups = {};
         this.currentFilename = '';
         this.edgePoints = [];
+        this.snapSegments = []; // [x1, y1, x2, y2] from the PDF's vector geometry
     this.snapEnabled = true;
     this.snapRadius = 15; // pixels
     this.clickDetectionMode = false;
+    this.regionDetectionMode = false;
+    this.regions = [];
 this.pendingGroupName = '';
     this.showSnapPreview = true;
     this.nearestSnapPoint = null;
@@ -94,6 +97,8 @@ if (viewByGroupBtn) viewByGroupBtn.addEventListener('click', () => this.viewByGr
         // Measurement controls
         document.getElementById('measureBtn').addEventListener('click', () => this.startMeasuring());
         document.getElementById('clearAllBtn').addEventListener('click', () => this.clearAllMeasurements());
+        const exportBtn = document.getElementById('exportBtn');
+        if (exportBtn) exportBtn.addEventListener('click', () => this.exportMeasurements());
         // Snap toggle
 const toggleSnapBtn = document.getElementById('toggleSnapBtn');
 if (toggleSnapBtn) {
@@ -139,6 +144,16 @@ clickMeasureBtn.style.display = 'none';
 document.querySelector('.panel-section:nth-child(3)').appendChild(clickMeasureBtn);
 
 clickMeasureBtn.addEventListener('click', () => this.startClickMeasurement());
+
+// Click-to-region mode: measures the area of the coloured region under the click
+const regionMeasureBtn = document.createElement('button');
+regionMeasureBtn.id = 'regionMeasureBtn';
+regionMeasureBtn.className = 'btn-primary';
+regionMeasureBtn.textContent = '🧩 Click Region for Area';
+regionMeasureBtn.style.display = 'none';
+document.querySelector('.panel-section:nth-child(3)').appendChild(regionMeasureBtn);
+
+regionMeasureBtn.addEventListener('click', () => this.startRegionMeasurement());
         if (autoDetectBtn) autoDetectBtn.addEventListener('click', () => this.detectLegends());
         if (viewLegendsBtn) viewLegendsBtn.addEventListener('click', () => this.showLegendsView());
         
@@ -229,8 +244,14 @@ clickMeasureBtn.addEventListener('click', () => this.startClickMeasurement());
         
         if (result.success) {
             this.edgePoints = result.edge_points;
-            console.log(`Loaded ${result.total_edges} edge points for snapping`);
-            this.updateTooltip(`Edge detection ready: ${result.total_edges} snap points`);
+            this.snapSegments = result.segments || [];
+            if (result.source === 'vector') {
+                console.log(`Loaded ${result.total_edges} vector segments for snapping`);
+                this.updateTooltip(`Vector snapping ready: ${result.total_edges} segments`);
+            } else {
+                console.log(`Loaded ${result.total_edges} edge points for snapping`);
+                this.updateTooltip(`Edge detection ready: ${result.total_edges} snap points`);
+            }
         }
     } catch (error) {
         console.error('Edge detection failed:', error);
@@ -296,6 +317,9 @@ clickMeasureBtn.addEventListener('click', () => this.startClickMeasurement());
         };
     }
     findNearestEdge(point) {
+    if (this.snapEnabled && this.snapSegments.length > 0) {
+        return this.findNearestSegmentPoint(point);
+    }
     if (!this.snapEnabled || this.edgePoints.length === 0) {
         return point;
     }
@@ -325,6 +349,44 @@ clickMeasureBtn.addEventListener('click', () => this.startClickMeasurement());
     return nearestPoint || point;
 }
     
+    // Vector PDFs: snap to the nearest segment endpoint within the radius,
+    // otherwise to the closest point on any segment (mirrors /snap-point)
+    findNearestSegmentPoint(point) {
+    const r = this.snapRadius;
+    let bestEnd = null, bestEndDist = Infinity;
+    let bestProj = null, bestProjDist = Infinity;
+    
+    for (let i = 0; i < this.snapSegments.length; i++) {
+        const [x1, y1, x2, y2] = this.snapSegments[i];
+        // Skip segments whose bounding box is out of reach
+        if (Math.min(x1, x2) - r > point.x || Math.max(x1, x2) + r < point.x ||
+            Math.min(y1, y2) - r > point.y || Math.max(y1, y2) + r < point.y) {
+            continue;
+        }
+        
+        for (const [ex, ey] of [[x1, y1], [x2, y2]]) {
+            const d = Math.hypot(ex - point.x, ey - point.y);
+            if (d < bestEndDist) {
+                bestEndDist = d;
+                bestEnd = { x: ex, y: ey };
+            }
+        }
+        
+        const dx = x2 - x1, dy = y2 - y1;
+        const lengthSq = Math.max(dx * dx + dy * dy, 1e-12);
+        const t = Math.max(0, Math.min(1, ((point.x - x1) * dx + (point.y - y1) * dy) / lengthSq));
+        const px = x1 + dx * t, py = y1 + dy * t;
+        const d = Math.hypot(px - point.x, py - point.y);
+        if (d < bestProjDist) {
+            bestProjDist = d;
+            bestProj = { x: px, y: py };
+        }
+    }
+    
+    this.nearestSnapPoint = bestEndDist <= r ? bestEnd : (bestProjDist <= r ? bestProj : null);
+    return this.nearestSnapPoint || point;
+}
+    
   handleMouseDown(e) {
     if (e.button !== 0) return;
     
@@ -336,6 +398,12 @@ clickMeasureBtn.addEventListener('click', () => this.startClickMeasurement());
         return;
     }
     
+    // Handle click-to-region mode
+    if (this.regionDetectionMode) {
+        this.measureRegionAtPoint(point);
+        return;
+    }
+    
     const snappedPoint = this.findNearestEdge(point);
     
     if (this.isCalibrating || this.isMeasuring) {
@@ -548,7 +616,22 @@ handleMouseUp(e) {
         }
         
         // Redraw measurements
-        // Redraw measurements
+        // Redraw measured regions as their bounding box with the area
+this.regions.forEach(region => {
+    this.ctx.save();
+    this.ctx.strokeStyle = '#8e44ad';
+    this.ctx.lineWidth = 3;
+    this.ctx.setLineDash([6, 4]);
+    this.ctx.strokeRect(region.x, region.y, region.width, region.height);
+    this.ctx.restore();
+    const area = this.pixelsToFeet(this.pixelsToFeet(region.area_pixels));
+    this.drawMeasurementLabel({
+        start: { x: region.x, y: region.y },
+        end: { x: region.x + region.width, y: region.y }
+    }, `${area.toFixed(2)} sq ft`);
+});
+
+// Redraw measurements
 this.measurements.forEach((measurement, index) => {
     const color = measurement.id === this.selectedMeasurement ? '#f39c12' : '#27ae60';
     const showArrows = measurement.showArrows || false;
@@ -1186,6 +1269,63 @@ async handleCanvasClick(point) {
     // It stays true so you can click the next object immediately.
 }
 
+startRegionMeasurement() {
+    if (this.regionDetectionMode) {
+        this.cancelCurrentOperation();
+        return;
+    }
+    if (this.clickDetectionMode) this.cancelCurrentOperation();
+    
+    this.regionDetectionMode = true;
+    this.isMeasuring = false;
+    this.isCalibrating = false;
+    
+    this.updateTooltip('[REGION MODE] Click inside a filled region to measure its area. Press ESC to stop.');
+    this.canvas.style.cursor = 'crosshair';
+    
+    document.getElementById('regionMeasureBtn').style.background = '#e74c3c';
+    document.getElementById('regionMeasureBtn').textContent = '🛑 Stop Region Mode (Esc)';
+}
+
+async measureRegionAtPoint(point) {
+    document.body.style.cursor = 'wait';
+    
+    try {
+        const response = await fetch('/measure-region', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                filename: this.currentFilename,
+                clicked_bounds: { x: Math.round(point.x), y: Math.round(point.y), width: 1, height: 1 }
+            })
+        });
+        
+        const result = await response.json();
+        
+        if (result.success && result.region) {
+            const group = this.currentGroupName;
+            this.regions.push({
+                ...result.region,
+                id: ++this.measurementIdCounter,
+                name: group ? `${group} - Region` : 'Region',
+                group: group
+            });
+            this.redrawCanvas();
+            
+            const area = this.pixelsToFeet(this.pixelsToFeet(result.region.area_pixels));
+            this.updateTooltip(`Region: ${area.toFixed(2)} sq ft`);
+        } else {
+            alert(result.error || 'Could not measure the region at click location.');
+        }
+    } catch (error) {
+        console.error(error);
+        alert('Server error.');
+    }
+    
+    document.body.style.cursor = 'default';
+    if (this.regionDetectionMode) this.canvas.style.cursor = 'crosshair';
+}
+
 findLegendAtPoint(point) {
     // Check if point is within any detected legend bounds
     for (let legend of this.detectedLegends) {
@@ -1412,10 +1552,11 @@ processClickedLegends(legends, color, pattern) {
     }
     
     clearAllMeasurements() {
-        if (this.measurements.length === 0) return;
+        if (this.measurements.length === 0 && this.regions.length === 0) return;
         
         if (confirm('Are you sure you want to delete all measurements?')) {
             this.measurements = [];
+            this.regions = [];
             this.selectedMeasurement = null;
             this.detectedLegends = [];
             this.legendGroups = {};
@@ -1427,6 +1568,43 @@ processClickedLegends(legends, color, pattern) {
         }
     }
     
+    async exportMeasurements() {
+        if (this.measurements.length === 0 && this.regions.length === 0) {
+            this.updateTooltip('No measurements to export');
+            return;
+        }
+        
+        try {
+            // The server recomputes every value against the stored calibration
+            const response = await fetch('/export-measurements', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({
+                    filename: this.currentFilename,
+                    format: 'csv',
+                    measurements: this.measurements,
+                    regions: this.regions
+                })
+            });
+            
+            if (!response.ok) {
+                const result = await response.json();
+                this.updateTooltip('Export failed: ' + result.error);
+                return;
+            }
+            
+            const blob = await response.blob();
+            const link = document.createElement('a');
+            link.href = URL.createObjectURL(blob);
+            link.download = (this.currentFilename || 'measurements').replace(/\.[^.]+$/, '') + '.csv';
+            link.click();
+            URL.revokeObjectURL(link.href);
+            this.updateTooltip(`Exported ${this.measurements.length + this.regions.length} measurements`);
+        } catch (error) {
+            this.updateTooltip('Export failed: ' + error.message);
+        }
+    }
+    
     // History management (Undo/Redo)
     saveToHistory() {
         // Remove any future states if we're not at the end
@@ -1663,6 +1841,8 @@ processClickedLegends(legends, color, pattern) {
     // Show click measurement option
     const clickBtn = document.getElementById('clickMeasureBtn');
     if (clickBtn) clickBtn.style.display = 'block';
+    const regionBtn = document.getElementById('regionMeasureBtn');
+    if (regionBtn) regionBtn.style.display = 'block';
     
     if (!this.currentGroupName) {
         this.promptGroupName();
@@ -1710,6 +1890,21 @@ processClickedLegends(legends, color, pattern) {
         return; // Exit early
     }
     
+    // Reset Click-to-Region Mode
+    if (this.regionDetectionMode) {
+        this.regionDetectionMode = false;
+        this.canvas.style.cursor = 'default';
+        
+        const btn = document.getElementById('regionMeasureBtn');
+        if (btn) {
+            btn.style.background = '';
+            btn.textContent = '🧩 Click Region for Area';
+        }
+        
+        this.updateTooltip('Region mode stopped.');
+        return;
+    }
+    
     document.getElementById('setCalibrateBtn').textContent = this.isCalibrated ? 'Recalibrate' : 'Set Reference';
     document.getElementById('measureBtn').classList.remove('active');
     
@@ -0,0 +1,256 @@
+# --- Vector geometry for CAD-exported PDFs ---
+# Extracts the line work and filled paths of a PDF page once (via PyMuPDF's
+# page.get_drawings()) into flat NumPy arrays, indexed by a uniform grid, so
+# snapping and click-to-wall measurement can be answered from exact geometry
+# instead of re-detecting lines in the rendered pixels.
+#
+# All coordinates are stored in the pixel space of the rendered PNG, so the
+# results line up with everything the frontend already draws.
+
+import numpy as np
+
+GRID_CELL_SIZE = 64        # Grid cell size in rendered pixels
+CURVE_STEPS = 8            # Straight pieces used to flatten each Bezier curve
+AXIS_TOLERANCE = 0.5       # Max pixel drift for a segment to count as horizontal/vertical
+
+
+def _flatten_path(items, transform):
+    """Turns the items of one get_drawings() path into a list of (x, y) polylines."""
+    a, b, c, d, e, f = transform
+
+    def tx(p):
+        return (a * p.x + c * p.y + e, b * p.x + d * p.y + f)
+
+    polylines = []
+    current = []
+    for item in items:
+        kind = item[0]
+        if kind == 'l':
+            start, end = tx(item[1]), tx(item[2])
+            if current and current[-1] != start:
+                polylines.append(current)
+                current = []
+            if not current:
+                current.append(start)
+            current.append(end)
+        elif kind == 'c':
+            p0, p1, p2, p3 = (np.array(tx(p)) for p in item[1:5])
+            t = np.linspace(0, 1, CURVE_STEPS + 1)[:, None]
+            pts = ((1 - t) ** 3 * p0 + 3 * (1 - t) ** 2 * t * p1 +
+                   3 * (1 - t) * t ** 2 * p2 + t ** 3 * p3)
+            pts = [tuple(pt) for pt in pts]
+            if current and current[-1] != pts[0]:
+                polylines.append(current)
+                current = []
+            current.extend(pts if not current else pts[1:])
+        elif kind == 're':
+            r = item[1]
+            if current:
+                polylines.append(current)
+                current = []
+            corners = [tx(r.tl), tx(r.tr), tx(r.br), tx(r.bl)]
+            polylines.append(corners + [corners[0]])
+        elif kind == 'qu':
+            q = item[1]
+            if current:
+                polylines.append(current)
+                current = []
+            corners = [tx(q.ul), tx(q.ur), tx(q.lr), tx(q.ll)]
+            polylines.append(corners + [corners[0]])
+    if current:
+        polylines.append(current)
+    return polylines
+
+
+class SegmentStore:
+    """
+    Array-backed store of line segments and filled polygons with a uniform
+    grid index over the segments.
+
+    segments     (N, 4) float32   x1, y1, x2, y2
+    widths       (N,)   float32   stroke width in pixels
+    fill_points  (M, 2) float32   vertices of all filled polygons (one per subpath), concatenated
+    fill_offsets (K+1,) int32     polygon k is fill_points[fill_offsets[k]:fill_offsets[k+1]]
+    fill_colors  (K, 3) uint8     RGB fill colour
+    cell_start / cell_items       CSR grid: segments touching cell i are
+                                  cell_items[cell_start[i]:cell_start[i+1]]
+    """
+
+    def __init__(self, segments, widths, fill_points, fill_offsets, fill_colors,
+                 width, height, cell_size=GRID_CELL_SIZE):
+        self.segments = np.asarray(segments, np.float32).reshape(-1, 4)
+        self.widths = np.asarray(widths, np.float32)
+        self.fill_points = np.asarray(fill_points, np.float32).reshape(-1, 2)
+        self.fill_offsets = np.asarray(fill_offsets, np.int32)
+        self.fill_colors = np.asarray(fill_colors, np.uint8).reshape(-1, 3)
+        self.width = int(width)
+        self.height = int(height)
+        self.cell_size = int(cell_size)
+        self.grid_w = max(1, -(-self.width // self.cell_size))
+        self.grid_h = max(1, -(-self.height // self.cell_size))
+        self._build_grid()
+
+    @classmethod
+    def from_page(cls, page, dpi, width, height):
+        """
+        Extracts every stroked and filled path on a PyMuPDF page. width/height
+        are the size of the pixmap rendered at the same dpi.
+        """
+        scale = dpi / 72.0
+        rot = page.rotation_matrix
+        transform = (rot.a * scale, rot.b * scale, rot.c * scale,
+                     rot.d * scale, rot.e * scale, rot.f * scale)
+        segments, widths = [], []
+        fill_points, fill_offsets, fill_colors = [], [0], []
+        for path in page.get_drawings():
+            polylines = _flatten_path(path['items'], transform)
+            if path.get('color') is not None:
+                stroke = (path.get('width') or 0) * scale
+                for line in polylines:
+                    for (x1, y1), (x2, y2) in zip(line, line[1:]):
+                        segments.append((x1, y1, x2, y2))
+                        widths.append(stroke)
+            if path.get('fill') is not None:
+                # Each subpath is its own polygon; joining them would bridge
+                # unrelated shapes and corrupt areas and bounds
+                color = [int(round(v * 255)) for v in path['fill'][:3]]
+                for line in polylines:
+                    if len(line) >= 3:
+                        fill_points.extend(line)
+                        fill_offsets.append(len(fill_points))
+                        fill_colors.append(color)
+
+        return cls(segments, widths, fill_points, fill_offsets, fill_colors, width, height)
+
+    @property
+    def nbytes(self):
+        """Memory held by the arrays, including the grid index."""
+        return sum(a.nbytes for a in (self.segments, self.widths, self.fill_points, self.fill_offsets,
+                                      self.fill_colors, self.cell_start, self.cell_items))
+
+    # --- Persistence ---
+
+    def save(self, path):
+        """Writes the store to a .npz file (the grid is rebuilt on load)."""
+        np.savez(path, segments=self.segments, widths=self.widths,
+                 fill_points=self.fill_points, fill_offsets=self.fill_offsets,
+                 fill_colors=self.fill_colors,
+                 meta=np.array([self.width, self.height, self.cell_size], np.int64))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            width, height, cell_size = (int(v) for v in data['meta'])
+            return cls(data['segments'], data['widths'], data['fill_points'],
+                       data['fill_offsets'], data['fill_colors'], width, height, cell_size)
+
+    # --- Grid index ---
+
+    def _cell_range(self, x1, y1, x2, y2):
+        cs = self.cell_size
+        cx0 = np.clip(np.floor(np.minimum(x1, x2) / cs), 0, self.grid_w - 1).astype(np.int64)
+        cx1 = np.clip(np.floor(np.maximum(x1, x2) / cs), 0, self.grid_w - 1).astype(np.int64)
+        cy0 = np.clip(np.floor(np.minimum(y1, y2) / cs), 0, self.grid_h - 1).astype(np.int64)
+        cy1 = np.clip(np.floor(np.maximum(y1, y2) / cs), 0, self.grid_h - 1).astype(np.int64)
+        return cx0, cx1, cy0, cy1
+
+    def _build_grid(self):
+        """Buckets every segment into each grid cell its bounding box overlaps."""
+        n_cells = self.grid_w * self.grid_h
+        if len(self.segments) == 0:
+            self.cell_start = np.zeros(n_cells + 1, np.int64)
+            self.cell_items = np.zeros(0, np.int32)
+            return
+
+        s = self.segments
+        cx0, cx1, cy0, cy1 = self._cell_range(s[:, 0], s[:, 1], s[:, 2], s[:, 3])
+        span_w = cx1 - cx0 + 1
+        counts = span_w * (cy1 - cy0 + 1)
+
+        # Expand each segment into one (cell, segment) pair per covered cell
+        seg_ids = np.repeat(np.arange(len(s), dtype=np.int32), counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cell_x = np.repeat(cx0, counts) + local % np.repeat(span_w, counts)
+        cell_y = np.repeat(cy0, counts) + local // np.repeat(span_w, counts)
+        cells = cell_y * self.grid_w + cell_x
+
+        order = np.argsort(cells, kind='stable')
+        self.cell_items = seg_ids[order]
+        self.cell_start = np.zeros(n_cells + 1, np.int64)
+        np.cumsum(np.bincount(cells, minlength=n_cells), out=self.cell_start[1:])
+
+    def query_box(self, x1, y1, x2, y2):
+        """Returns the indices of segments that may intersect the given box."""
+        if len(self.segments) == 0:
+            return np.zeros(0, np.int32)
+        cx0, cx1, cy0, cy1 = (int(v) for v in self._cell_range(x1, y1, x2, y2))
+        chunks = []
+        for cy in range(cy0, cy1 + 1):
+            row = cy * self.grid_w
+            chunks.append(self.cell_items[self.cell_start[row + cx0]:self.cell_start[row + cx1 + 1]])
+        return np.unique(np.concatenate(chunks))
+
+    # --- Queries ---
+
+    def snap(self, x, y, radius):
+        """
+        Snaps (x, y) to the nearest segment endpoint within radius, falling back
+        to the nearest point on any segment. Returns (sx, sy, kind) or None.
+        """
+        idx = self.query_box(x - radius, y - radius, x + radius, y + radius)
+        if len(idx) == 0:
+            return None
+        s = self.segments[idx].astype(np.float64)
+
+        ends = s.reshape(-1, 2)
+        end_dist = np.hypot(ends[:, 0] - x, ends[:, 1] - y)
+        best = int(np.argmin(end_dist))
+        if end_dist[best] <= radius:
+            return float(ends[best, 0]), float(ends[best, 1]), 'endpoint'
+
+        # Project the point onto every candidate segment
+        d = s[:, 2:] - s[:, :2]
+        length_sq = np.maximum((d ** 2).sum(axis=1), 1e-12)
+        t = np.clip(((x - s[:, 0]) * d[:, 0] + (y - s[:, 1]) * d[:, 1]) / length_sq, 0, 1)
+        proj = s[:, :2] + d * t[:, None]
+        dist = np.hypot(proj[:, 0] - x, proj[:, 1] - y)
+        best = int(np.argmin(dist))
+        if dist[best] <= radius:
+            return float(proj[best, 0]), float(proj[best, 1]), 'segment'
+        return None
+
+    def enclosing_box(self, x, y, radius):
+        """
+        Finds the nearest horizontal segments above/below and vertical segments
+        left/right of (x, y) that span the click, within radius. Missing sides
+        fall back to the search radius. Returns (left, top, right, bottom).
+        """
+        idx = self.query_box(x - radius, y - radius, x + radius, y + radius)
+        s = self.segments[idx]
+        x1, y1, x2, y2 = s[:, 0], s[:, 1], s[:, 2], s[:, 3]
+
+        horizontal = (np.abs(y1 - y2) <= AXIS_TOLERANCE) & \
+            (np.minimum(x1, x2) < x) & (x < np.maximum(x1, x2))
+        vertical = (np.abs(x1 - x2) <= AXIS_TOLERANCE) & \
+            (np.minimum(y1, y2) < y) & (y < np.maximum(y1, y2))
+        h_pos = (y1[horizontal] + y2[horizontal]) / 2
+        v_pos = (x1[vertical] + x2[vertical]) / 2
+
+        above = h_pos[(h_pos < y) & (h_pos >= y - radius)]
+        below = h_pos[(h_pos > y) & (h_pos <= y + radius)]
+        left = v_pos[(v_pos < x) & (v_pos >= x - radius)]
+        right = v_pos[(v_pos > x) & (v_pos <= x + radius)]
+
+        return (float(left.max()) if len(left) else max(0.0, x - radius),
+                float(above.max()) if len(above) else max(0.0, y - radius),
+                float(right.min()) if len(right) else min(float(self.width), x + radius),
+                float(below.min()) if len(below) else min(float(self.height), y + radius))
+
+    def fill_regions(self):
+        """Yields (color_rgb, points, area) for every filled polygon, points as (P, 2) float64."""
+        for k in range(len(self.fill_colors)):
+            pts = self.fill_points[self.fill_offsets[k]:self.fill_offsets[k + 1]].astype(np.float64)
+            # Shoelace formula
+            area = 0.5 * abs(np.dot(pts[:, 0], np.roll(pts[:, 1], -1)) -
+                             np.dot(pts[:, 1], np.roll(pts[:, 0], -1)))
+            yield tuple(int(v) for v in self.fill_colors[k]), pts, float(area)